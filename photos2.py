@@ -2,14 +2,54 @@ import os
 import sys
 import shutil
 import logging
-from typing import List, Dict, Set
+import sqlite3
+import itertools
+import hashlib
+import mmap
+import gc
+import multiprocessing
+from typing import List, Dict, Set, Tuple, Optional, Iterator
+from collections import deque, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 from datetime import datetime
+import PIL
 from PIL import Image, UnidentifiedImageError
-import imagehash
+import numpy as np
 
-def setup_logging(output_dir: str) -> None:
-    """Set up logging to both file and console."""
+try:
+    import xxhash
+except ImportError:  # xxhash is optional; content digests fall back to hashlib
+    xxhash = None
+
+try:
+    from numba import njit, prange
+except ImportError:  # numba is optional; the NumPy screen is used without it
+    njit = None
+
+# Vectorized per-element popcount, available from NumPy 2.0
+_bitwise_count = getattr(np, "bitwise_count", None)
+
+# Number of set bits in each byte value, used for popcount when np.bitwise_count is missing
+_POPCOUNT_LUT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+# Leading bytes hashed to tell apart same-sized files before any full read
+_PREFIX_BYTES = 64 * 1024
+
+# Fewest hashes for which the numba screen is used; below this its one-off compile
+# (several seconds on a cold cache) costs more than the NumPy screen saves
+_JIT_MIN_HASHES = 5000
+
+# Images hashed by a worker between explicit garbage collections
+_GC_EVERY = 1024
+_hashed_since_gc = 0
+
+# Rows compared per block in the pairwise screen; bounds memory to _SCREEN_CHUNK**2 * hash bytes
+_SCREEN_CHUNK = 1024
+
+def setup_logging(output_dir: str, level: int = logging.INFO) -> None:
+    """Set up logging at the given level to both file and console."""
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
         
@@ -17,7 +57,7 @@ def setup_logging(output_dir: str) -> None:
     
     # Configure logging to write to both file and console
     logging.basicConfig(
-        level=logging.INFO,
+        level=level,
         format='%(asctime)s - %(levelname)s - %(message)s',
         handlers=[
             logging.FileHandler(log_file),
@@ -26,11 +66,419 @@ def setup_logging(output_dir: str) -> None:
     )
     logging.info(f"Logging to: {log_file}")
 
+def pillow_backend() -> str:
+    """Describe the Pillow build in use; Pillow-SIMD releases carry a '.postN' version suffix."""
+    flavour = "Pillow-SIMD" if ".post" in PIL.__version__ else "Pillow"
+    return f"{flavour} {PIL.__version__}"
+
+def _file_digest(filepath: str, limit: Optional[int] = None) -> bytes:
+    """
+    Content digest of a file, or of only its first limit bytes.
+    
+    Uses 128-bit XXH3 when xxhash is installed and SHA-1 otherwise; whole
+    files are hashed straight from a read-only memory map.
+    """
+    digest = xxhash.xxh3_128() if xxhash is not None else hashlib.sha1()
+    with open(filepath, 'rb') as f:
+        if limit is not None:
+            digest.update(f.read(limit))
+        elif os.fstat(f.fileno()).st_size > 0:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                digest.update(mapped)
+    return digest.digest()
+
+def _hash_nbytes(hash_size: int) -> int:
+    """Number of bytes in a packed hash of hash_size x hash_size bits."""
+    return (hash_size * hash_size + 7) // 8
+
+def _fast_ahash(filepath: str, hash_size: int) -> int:
+    """
+    Compute an average hash as an integer of packed bits.
+    
+    JPEGs are decoded straight to a reduced-size greyscale image via draft(),
+    which skips most of the IDCT work for an image that is about to be shrunk
+    to hash_size x hash_size anyway. draft() only ever scales down to a size
+    at least 8x the hash, so the final resize still averages many pixels.
+    
+    Args:
+        filepath (str): Path to the image file
+        hash_size (int): Width and height of the hash in bits
+        
+    Returns:
+        int: The packed hash bits, big-endian
+    """
+    with Image.open(filepath) as img:
+        if img.format == 'JPEG':
+            img.draft("L", (hash_size * 8, hash_size * 8))
+        img.load()
+    # The file handle is released here; the decoded pixels stay in memory
+    grey = img if img.mode == "L" else img.convert("L")
+    pixels = np.frombuffer(grey.resize((hash_size, hash_size), Image.BILINEAR).tobytes(), dtype=np.uint8)
+    del img, grey
+    return int.from_bytes(np.packbits(pixels > pixels.mean()).tobytes(), 'big')
+
+def _hash_one(args: Tuple[str, int]) -> Tuple[str, Optional[int], Optional[str]]:
+    """
+    Compute the average hash of a single image. Runs in worker processes.
+    
+    Args:
+        args (Tuple[str, int]): Image file path and hash size
+        
+    Returns:
+        Tuple[str, Optional[int], Optional[str]]: The file path, the hash (None if the
+        image could not be identified) and an error message (None on success)
+    """
+    filepath, hash_size = args
+    try:
+        return filepath, _fast_ahash(filepath, hash_size), None
+    except UnidentifiedImageError:
+        return filepath, None, None
+    except Exception as e:
+        return filepath, None, str(e)
+
+def _hash_batch(tasks: List[Tuple[str, int]]) -> List[Tuple[str, Optional[int], Optional[str]]]:
+    """Run _hash_one over a batch of tasks, so each worker round-trip covers several images."""
+    global _hashed_since_gc
+    results = [_hash_one(task) for task in tasks]
+    # Periodically reclaim reference cycles left by decoder objects to keep worker RSS flat
+    _hashed_since_gc += len(tasks)
+    if _hashed_since_gc >= _GC_EVERY:
+        gc.collect()
+        _hashed_since_gc = 0
+    return results
+
+def _pipelined_hashes(files: List[str], hash_size: int, workers: int,
+                      chunksize: int) -> Iterator[Tuple[str, Optional[int], Optional[str]]]:
+    """
+    Hash images in worker processes, yielding _hash_one results in input order.
+    
+    At most 2 * workers batches are in flight at once, so the caller deduplicates
+    finished hashes while decoding continues, and memory stays bounded however
+    large the library is.
+    
+    On POSIX the workers are started by a forkserver, which re-imports the
+    calling script's main module: a script that calls this (directly or via
+    find_unique_images) must do so under an ``if __name__ == "__main__":`` guard.
+    
+    Args:
+        files (List[str]): Image file paths to hash
+        hash_size (int): Size of the hash to generate
+        workers (int): Number of worker processes
+        chunksize (int): Number of images per batch sent to a worker
+        
+    Yields:
+        Tuple[str, Optional[int], Optional[str]]: The _hash_one result for each file
+        
+    Raises:
+        BrokenProcessPool: If a worker process died, with a hint about common causes
+    """
+    tasks = ((filepath, hash_size) for filepath in files)
+    batches = iter(lambda: list(itertools.islice(tasks, chunksize)), [])
+    in_flight = deque()
+    # Forking after numba's threading layer has started can deadlock; forkserver children start clean
+    context = multiprocessing.get_context("forkserver") if os.name == "posix" else None
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            for batch in batches:
+                if len(in_flight) >= 2 * workers:
+                    yield from in_flight.popleft().result()
+                in_flight.append(executor.submit(_hash_batch, batch))
+            while in_flight:
+                yield from in_flight.popleft().result()
+    except BrokenProcessPool as e:
+        raise BrokenProcessPool(
+            "A hashing worker process terminated abruptly, for example because it was killed "
+            "for using too much memory or crashed while decoding a file. This also happens if "
+            "the calling script lacks an 'if __name__ == \"__main__\":' guard, since worker "
+            "processes re-import the main module."
+        ) from e
+
+def _hamming(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Bitwise Hamming distance between broadcastable arrays of packed hashes.
+    
+    Uses the SIMD popcount behind np.bitwise_count (NumPy >= 2.0) on any unsigned
+    dtype, falling back to a byte lookup table, which needs uint8 input.
+    """
+    if _bitwise_count is not None:
+        return _bitwise_count(a ^ b).sum(axis=-1)
+    return _POPCOUNT_LUT[a ^ b].sum(axis=-1)
+
+def _screen_similar(packed: np.ndarray, max_diff: int) -> List[int]:
+    """
+    Select hashes that are not within max_diff bits of an earlier selected hash.
+    
+    Args:
+        packed (np.ndarray): Packed hashes of shape (N, B), dtype uint8, in input order
+        max_diff (int): Largest Hamming distance at which two hashes count as similar
+        
+    Returns:
+        List[int]: Indices of the selected hashes, in ascending order
+    """
+    if _bitwise_count is not None:
+        # Fewer, wider elements per row once popcount no longer goes through the byte table
+        packed = _to_words(packed)
+    kept = packed[:0]
+    selected = []
+    for start in range(0, len(packed), _SCREEN_CHUNK):
+        block = packed[start:start + _SCREEN_CHUNK]
+        
+        # Drop candidates close to a hash kept from an earlier block
+        candidates = np.ones(len(block), dtype=bool)
+        for kstart in range(0, len(kept), _SCREEN_CHUNK):
+            near = _hamming(block[:, None, :], kept[None, kstart:kstart + _SCREEN_CHUNK, :]) <= max_diff
+            candidates &= ~near.any(axis=1)
+        
+        # Resolve the remaining candidates against each other in input order
+        within = _hamming(block[:, None, :], block[None, :, :]) <= max_diff
+        block_keep = np.zeros(len(block), dtype=bool)
+        for i in np.flatnonzero(candidates):
+            block_keep[i] = not within[i, :i][block_keep[:i]].any()
+        
+        selected.extend((start + np.flatnonzero(block_keep)).tolist())
+        kept = np.concatenate([kept, block[block_keep]])
+    return selected
+
+class BKTree:
+    """A BK-tree over integer hashes, using Hamming distance as the metric."""
+    
+    def __init__(self):
+        # Each node is a (hash, {distance: child node}) pair
+        self.root = None
+    
+    def insert(self, hash_int: int) -> None:
+        """Add a hash to the tree."""
+        if self.root is None:
+            self.root = (hash_int, {})
+            return
+        node = self.root
+        while True:
+            d = (hash_int ^ node[0]).bit_count()
+            child = node[1].get(d)
+            if child is None:
+                node[1][d] = (hash_int, {})
+                return
+            node = child
+    
+    def query(self, hash_int: int, max_diff: int) -> Optional[int]:
+        """Return a stored hash within max_diff bits of hash_int, or None if there is none."""
+        if self.root is None:
+            return None
+        stack = [self.root]
+        while stack:
+            value, children = stack.pop()
+            d = (hash_int ^ value).bit_count()
+            if d <= max_diff:
+                return value
+            # Triangle inequality: only subtrees at distance d +/- max_diff can hold a match
+            for child_d, child in children.items():
+                if d - max_diff <= child_d <= d + max_diff:
+                    stack.append(child)
+        return None
+
+def _screen_similar_bktree(hashes: List[int], max_diff: int) -> List[int]:
+    """Equivalent of _screen_similar over integer hashes, indexed with a BK-tree."""
+    tree = BKTree()
+    selected = []
+    for i, hash_int in enumerate(hashes):
+        if tree.query(hash_int, max_diff) is None:
+            tree.insert(hash_int)
+            selected.append(i)
+    return selected
+
+def _to_words(packed: np.ndarray) -> np.ndarray:
+    """View packed uint8 hashes of shape (N, B) as uint64 words of shape (N, ceil(B / 8))."""
+    pad = -packed.shape[1] % 8
+    if pad:
+        packed = np.pad(packed, ((0, 0), (0, pad)))
+    return np.ascontiguousarray(packed).view(np.uint64)
+
+if njit is not None:
+    @njit(inline='always')
+    def _popcount64(x):
+        """SWAR popcount of a uint64."""
+        x = x - ((x >> np.uint64(1)) & np.uint64(0x5555555555555555))
+        x = (x & np.uint64(0x3333333333333333)) + ((x >> np.uint64(2)) & np.uint64(0x3333333333333333))
+        x = (x + (x >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+        return np.int64((x * np.uint64(0x0101010101010101)) >> np.uint64(56))
+
+    @njit(inline='always')
+    def _word_distance(a, i, b, j):
+        """Hamming distance between row i of a and row j of b, both uint64 word arrays."""
+        d = 0
+        for k in range(a.shape[1]):
+            d += _popcount64(a[i, k] ^ b[j, k])
+        return d
+
+    @njit(inline='always')
+    def _any_within(haystack, count, words, i, max_diff):
+        """Whether row i of words is within max_diff bits of any of the first count haystack rows."""
+        for t in range(count):
+            if _word_distance(haystack, t, words, i) <= max_diff:
+                return True
+        return False
+
+    @njit(parallel=True, cache=True)
+    def _screen_similar_jit(words, max_diff):
+        """
+        Compiled equivalent of _screen_similar over uint64 words.
+        
+        Rows with no similar earlier row at all are found in parallel and kept
+        outright; only the flagged rows go through the sequential greedy pass.
+        """
+        n = words.shape[0]
+        flagged = np.zeros(n, dtype=np.bool_)
+        for i in prange(n):
+            for j in range(i):
+                if _word_distance(words, i, words, j) <= max_diff:
+                    flagged[i] = True
+                    break
+        
+        # Kept rows are copied into a contiguous haystack so the scan streams memory
+        kept = np.empty(n, dtype=np.int64)
+        haystack = np.empty_like(words)
+        nkept = 0
+        for i in range(n):
+            if flagged[i] and _any_within(haystack, nkept, words, i, max_diff):
+                continue
+            kept[nkept] = i
+            haystack[nkept] = words[i]
+            nkept += 1
+        return kept[:nkept]
+
+def _fast_move(src: str, dst: str) -> None:
+    """Move a file, renaming in place when source and destination share a filesystem."""
+    try:
+        os.rename(src, dst)
+    except OSError:
+        shutil.move(src, dst)
+
+def _fast_copy(src: str, dst: str) -> None:
+    """Copy a file with metadata, letting the kernel copy (or reflink) the data where supported."""
+    try:
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            remaining = os.fstat(fsrc.fileno()).st_size
+            while remaining > 0:
+                copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                if copied == 0:
+                    break
+                remaining -= copied
+        if remaining > 0:
+            raise OSError(f"short copy of {src}")
+        shutil.copystat(src, dst)
+    except (AttributeError, OSError):
+        shutil.copy2(src, dst)
+
+class HashCache:
+    """
+    An on-disk cache of image hashes keyed by path, file size, mtime and hash size.
+    
+    The cache is only an optimisation: after the first SQLite error it logs a
+    warning and turns itself off, and every later call is a cheap no-op.
+    """
+    
+    # Pending inserts are committed in batches of this size
+    COMMIT_EVERY = 500
+    
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+        try:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS h (path TEXT, size INT, mtime REAL, hs INT, hash TEXT, "
+                "PRIMARY KEY (path, hs))"
+            )
+        except sqlite3.Error:
+            connection.close()
+            raise
+        self._stats = {}
+        self._pending = 0
+    
+    @property
+    def active(self) -> bool:
+        """Whether the cache is still in use for this run."""
+        return self.connection is not None
+    
+    def _disable(self, error: sqlite3.Error) -> None:
+        """Log a failure once and stop using the cache, dropping any uncommitted inserts."""
+        logging.warning(f"Hash cache disabled after a database error: {error}")
+        try:
+            self.connection.close()
+        except sqlite3.Error:
+            pass
+        self.connection = None
+    
+    @classmethod
+    def open(cls, cache_file: str) -> Optional["HashCache"]:
+        """
+        Open (creating if needed) the cache database.
+        
+        Args:
+            cache_file (str): Path to the SQLite database file
+            
+        Returns:
+            Optional[HashCache]: The cache, or None if the database could not be opened
+        """
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(cache_file)), exist_ok=True)
+            return cls(sqlite3.connect(cache_file))
+        except (OSError, sqlite3.Error) as e:
+            logging.warning(f"Hash cache disabled, could not open {cache_file}: {e}")
+            return None
+    
+    def get(self, filepath: str, hash_size: int) -> Optional[int]:
+        """Return the cached hash for an unchanged file, or None on a miss."""
+        if not self.active:
+            return None
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            return None
+        path = os.path.abspath(filepath)
+        self._stats[path] = (st.st_size, st.st_mtime)
+        try:
+            row = self.connection.execute(
+                "SELECT hash FROM h WHERE path=? AND size=? AND mtime=? AND hs=?",
+                (path, st.st_size, st.st_mtime, hash_size)
+            ).fetchone()
+        except sqlite3.Error as e:
+            self._disable(e)
+            return None
+        return int(row[0], 16) if row else None
+    
+    def put(self, filepath: str, hash_size: int, hash_value: int) -> None:
+        """Store a freshly computed hash, using the file stat recorded by get()."""
+        path = os.path.abspath(filepath)
+        if not self.active or path not in self._stats:
+            return
+        size, mtime = self._stats[path]
+        try:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO h (path, size, mtime, hs, hash) VALUES (?, ?, ?, ?, ?)",
+                (path, size, mtime, hash_size, format(hash_value, 'x'))
+            )
+            self._pending += 1
+            if self._pending >= self.COMMIT_EVERY:
+                self.connection.commit()
+                self._pending = 0
+        except sqlite3.Error as e:
+            self._disable(e)
+    
+    def close(self) -> None:
+        """Commit outstanding inserts and close the database."""
+        if not self.active:
+            return
+        try:
+            self.connection.commit()
+            self.connection.close()
+        except sqlite3.Error as e:
+            self._disable(e)
+        self.connection = None
+
 class Photo:
     """A class to handle photo deduplication based on perceptual image hashing."""
     
     # Supported image formats
-    SUPPORTED_FORMATS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp'}
+    SUPPORTED_FORMATS = frozenset({'.jpg', '.jpeg', '.png', '.gif', '.bmp'})
     
     def scan_directory(self, directory: str) -> List[str]:
         """
@@ -49,19 +497,93 @@ class Photo:
             logging.error(f"Error: Input directory '{directory}' does not exist")
             sys.exit(1)
             
-        image_files = []
-        for root, _, files in os.walk(directory):
-            for file in files:
-                file_ext = os.path.splitext(file.lower())[1]
-                if file_ext in self.SUPPORTED_FORMATS:
-                    image_files.append(os.path.join(root, file))
+        image_files = list(self._walk(directory))
         
         if not image_files:
             logging.warning(f"No supported image files found in {directory}")
             
         return image_files
     
-    def find_unique_images(self, files: List[str], hash_size: int = 8, threshold: int = 0) -> Dict[str, str]:
+    def _walk(self, directory: str) -> Iterator[str]:
+        """Yield supported image paths under a directory, files before subdirectories like os.walk."""
+        subdirs = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.is_file():
+                        name = entry.name
+                        dot = name.rfind('.')
+                        if dot > 0 and name[dot:].lower() in self.SUPPORTED_FORMATS:
+                            yield entry.path
+        except OSError as e:
+            logging.debug(f"Skipping unreadable directory {directory}: {e}")
+            return
+        for subdir in subdirs:
+            yield from self._walk(subdir)
+    
+    def _drop_exact_duplicates(self, files: List[str]) -> List[str]:
+        """
+        Drop hardlinked and byte-identical repeats before any image is decoded.
+        
+        Files are first matched on (st_dev, st_ino), then on size, then on a
+        digest of their first 64 KiB. Files that still collide and are larger
+        than that are confirmed with a full-content digest.
+        
+        Args:
+            files (List[str]): List of image file paths
+            
+        Returns:
+            List[str]: The files without repeats, keeping the first occurrence in input order
+        """
+        seen_inodes = set()
+        by_size = defaultdict(list)
+        # Positions rather than paths, so a path listed twice keeps its first occurrence
+        dropped = set()
+        for idx, filepath in enumerate(files):
+            try:
+                st = os.stat(filepath)
+            except OSError:
+                continue
+            inode = (st.st_dev, st.st_ino)
+            if inode in seen_inodes:
+                dropped.add(idx)
+                continue
+            seen_inodes.add(inode)
+            by_size[st.st_size].append(idx)
+        
+        for size, group in by_size.items():
+            if len(group) < 2:
+                continue
+            by_prefix = defaultdict(list)
+            for idx in group:
+                try:
+                    by_prefix[_file_digest(files[idx], _PREFIX_BYTES)].append(idx)
+                except OSError:
+                    pass
+            for same_prefix in by_prefix.values():
+                if len(same_prefix) < 2:
+                    continue
+                if size <= _PREFIX_BYTES:
+                    dropped.update(same_prefix[1:])
+                    continue
+                seen_digests = set()
+                for idx in same_prefix:
+                    try:
+                        digest = _file_digest(files[idx])
+                    except OSError:
+                        continue
+                    if digest in seen_digests:
+                        dropped.add(idx)
+                    seen_digests.add(digest)
+        
+        if dropped:
+            logging.info(f"Skipping {len(dropped)} exact duplicate files")
+        return [filepath for idx, filepath in enumerate(files) if idx not in dropped]
+    
+    def find_unique_images(self, files: List[str], hash_size: int = 8, threshold: int = 0,
+                           cache_file: Optional[str] = None, num_workers: Optional[int] = None) -> Dict[int, str]:
         """
         Find unique images using perceptual hashing.
         
@@ -69,56 +591,99 @@ class Photo:
             files (List[str]): List of image file paths
             hash_size (int): Size of the hash to generate (default: 8)
             threshold (int): Similarity threshold (0-100, default: 0)
+            cache_file (Optional[str]): SQLite file used to reuse hashes across runs (default: None)
+            num_workers (Optional[int]): Number of hashing processes (default: one per CPU)
             
         Returns:
-            Dict[str, str]: Dictionary mapping hash values to file paths
+            Dict[int, str]: Dictionary mapping hash values to file paths
+            
+        Raises:
+            BrokenProcessPool: If a hashing worker dies, e.g. from running out of memory or
+                from a script calling this without an ``if __name__ == "__main__":`` guard
         """
+        files = self._drop_exact_duplicates(files)
         unique_images = {}
+        nbytes = _hash_nbytes(hash_size)
+        nbits = hash_size * hash_size
+        # "similarity >= threshold" percent, rewritten as an exact bound on differing bits
+        max_diff = (100 - threshold) * nbits // 100
+        # Hashes awaiting the similarity screen, kept as parallel arrays plus one contiguous byte buffer
+        screen_hashes = []
+        screen_paths = []
+        packed = bytearray()
         total_files = len(files)
         
-        for i, filepath in enumerate(files, 1):
-            try:
-                with Image.open(filepath) as img:
-                    hash_value = str(imagehash.average_hash(img, hash_size))
-                    
-                    # Check for similar images if threshold > 0
-                    if threshold > 0:
-                        is_similar = False
-                        for existing_hash in unique_images:
-                            if self._calculate_similarity(hash_value, existing_hash) >= threshold:
-                                is_similar = True
-                                break
-                        if not is_similar:
-                            unique_images[hash_value] = filepath
-                    else:
-                        unique_images[hash_value] = filepath
-                    
-                    # Log progress every 10%
-                    if i % max(1, total_files // 10) == 0:
-                        logging.info(f"Processed {i}/{total_files} images ({i/total_files*100:.1f}%)")
-                        
-            except UnidentifiedImageError:
-                logging.warning(f"Skipping corrupted or unsupported image: {filepath}")
-            except Exception as e:
-                logging.error(f"Error processing {filepath}: {e}")
+        cache = HashCache.open(cache_file) if cache_file and files else None
+        try:
+            cached = {}
+            if cache is not None:
+                for filepath in files:
+                    hash_value = cache.get(filepath, hash_size)
+                    if hash_value is not None:
+                        cached[filepath] = hash_value
+                if cache.active:
+                    logging.info(f"Reusing {len(cached)} cached hashes from {cache_file}")
+            pending = [filepath for filepath in files if filepath not in cached]
+            
+            stride = max(1, total_files // 10)
+            
+            # Decoding and hashing are CPU-bound, so fan them out across processes
+            workers = num_workers or os.cpu_count() or 1
+            chunksize = max(1, min(64, len(pending) // (workers * 4)))
+            results = _pipelined_hashes(pending, hash_size, workers, chunksize)
+            for i, filepath in enumerate(files, 1):
+                if filepath in cached:
+                    hash_value, error = cached[filepath], None
+                else:
+                    filepath, hash_value, error = next(results)
+                    if cache is not None and hash_value is not None:
+                        cache.put(filepath, hash_size, hash_value)
+                
+                if error is not None:
+                    logging.error("Error processing %s: %s", filepath, error)
+                elif hash_value is None:
+                    logging.warning("Skipping corrupted or unsupported image: %s", filepath)
+                elif threshold > 0:
+                    # Similar images are screened in one vectorized pass once all hashes are known
+                    screen_hashes.append(hash_value)
+                    screen_paths.append(filepath)
+                    packed += hash_value.to_bytes(nbytes, 'big')
+                else:
+                    unique_images[hash_value] = filepath
+                
+                # Log progress every 10%
+                if i % stride == 0:
+                    logging.info("Processed %d/%d images (%.1f%%)", i, total_files, i / total_files * 100)
+        finally:
+            # Commit whatever was hashed even if the pool fails part-way
+            if cache is not None:
+                cache.close()
+        
+        if screen_hashes:
+            packed = np.frombuffer(packed, dtype=np.uint8).reshape(-1, nbytes)
+            if njit is not None and len(screen_hashes) >= _JIT_MIN_HASHES:
+                indices = _screen_similar_jit(_to_words(packed), max_diff).tolist()
+            elif _bitwise_count is None and max_diff <= nbits // 16:
+                # A BK-tree beats the lookup-table screen only for tight radii: on 20k random
+                # 64-bit hashes it is ahead up to 4 bits and slower from 5 bits on
+                indices = _screen_similar_bktree(screen_hashes, max_diff)
+            else:
+                indices = _screen_similar(packed, max_diff)
+            for idx in indices:
+                unique_images[screen_hashes[idx]] = screen_paths[idx]
                 
         return unique_images
     
-    def _calculate_similarity(self, hash1: str, hash2: str) -> float:
-        """Calculate similarity percentage between two image hashes."""
-        if len(hash1) != len(hash2):
-            return 0.0
-        diff_bits = sum(bit1 != bit2 for bit1, bit2 in zip(hash1, hash2))
-        return 100 - (diff_bits * 100 / len(hash1))
-    
-    def process_unique_files(self, filetable: Dict[str, str], output_directory: str, copy: bool = False) -> None:
+    def process_unique_files(self, filetable: Dict[int, str], output_directory: str, copy: bool = False,
+                             hash_size: int = 8) -> None:
         """
         Process unique files by either moving or copying them to the output directory.
         
         Args:
-            filetable (Dict[str, str]): Dictionary mapping hash values to file paths
+            filetable (Dict[int, str]): Dictionary mapping hash values to file paths
             output_directory (str): Path to the output directory
             copy (bool): If True, copy files instead of moving them
+            hash_size (int): Hash size the table was built with, for debug output (default: 8)
         """
         if not os.path.exists(output_directory):
             try:
@@ -128,30 +693,37 @@ class Photo:
                 logging.error(f"Error creating output directory: {e}")
                 sys.exit(1)
 
-        operation = shutil.copy2 if copy else shutil.move
+        # Names already taken in the output directory, so conflicts resolve without a stat per probe.
+        # Compared casefolded, since case-insensitive filesystems would let a rename overwrite a case variant
+        used = {name.casefold() for name in os.listdir(output_directory)}
+        
+        operation = _fast_copy if copy else _fast_move
         operation_name = "Copying" if copy else "Moving"
+        debug = logging.getLogger().isEnabledFor(logging.DEBUG)
         
         total_files = len(filetable)
         for i, (hash_value, filepath) in enumerate(filetable.items(), 1):
             try:
                 filename = os.path.basename(filepath)
-                dest_path = os.path.join(output_directory, filename)
                 
                 # Handle filename conflicts
-                if os.path.exists(dest_path):
+                if filename.casefold() in used:
                     base, ext = os.path.splitext(filename)
-                    counter = 1
-                    while os.path.exists(dest_path):
-                        new_filename = f"{base}_{counter}{ext}"
-                        dest_path = os.path.join(output_directory, new_filename)
-                        counter += 1
+                    for counter in itertools.count(1):
+                        candidate = f"{base}_{counter}{ext}"
+                        if candidate.casefold() not in used:
+                            filename = candidate
+                            break
+                used.add(filename.casefold())
+                dest_path = os.path.join(output_directory, filename)
                 
                 operation(filepath, dest_path)
-                logging.info(f"{operation_name} ({i}/{total_files}): {filepath}")
-                logging.debug(f"Hash: {hash_value}")
+                logging.info("%s (%d/%d): %s", operation_name, i, total_files, filepath)
+                if debug:
+                    logging.debug("Hash: %s", f"{hash_value:0{_hash_nbytes(hash_size) * 2}x}")
                 
             except Exception as e:
-                logging.error(f"Error {operation_name.lower()} file {filepath}: {e}")
+                logging.error("Error %s file %s: %s", operation_name.lower(), filepath, e)
 
 def main():
     import argparse
@@ -163,29 +735,34 @@ def main():
     parser.add_argument("--hash-size", type=int, default=8, help="Hash size for image comparison (default: 8)")
     parser.add_argument("--threshold", type=int, default=0, 
                       help="Similarity threshold percentage (0-100, default: 0)")
+    parser.add_argument("--num-workers", type=int, default=None,
+                      help="Number of processes used to hash images (default: one per CPU)")
     parser.add_argument("--debug", action="store_true", help="Enable debug logging")
     
     args = parser.parse_args()
     
     # Set up logging first
-    setup_logging(args.output_dir)
-    
-    if args.debug:
-        logging.getLogger().setLevel(logging.DEBUG)
+    setup_logging(args.output_dir, logging.DEBUG if args.debug else logging.INFO)
     
     if args.threshold < 0 or args.threshold > 100:
         logging.error("Threshold must be between 0 and 100")
         sys.exit(1)
     
+    if args.num_workers is not None and args.num_workers < 1:
+        logging.error("Number of workers must be at least 1")
+        sys.exit(1)
+    
     logging.info(f"Starting photo deduplication")
     logging.info(f"Input directory: {args.input_dir}")
     logging.info(f"Output directory: {args.output_dir}")
-    logging.info(f"Options: copy={args.copy}, hash_size={args.hash_size}, threshold={args.threshold}, debug={args.debug}")
+    logging.info(f"Image backend: {pillow_backend()}")
+    logging.info(f"Options: copy={args.copy}, hash_size={args.hash_size}, threshold={args.threshold}, num_workers={args.num_workers}, debug={args.debug}")
     
     photo = Photo()
     files = photo.scan_directory(args.input_dir)
-    unique_files = photo.find_unique_images(files, args.hash_size, args.threshold)
-    photo.process_unique_files(unique_files, args.output_dir, args.copy)
+    unique_files = photo.find_unique_images(files, args.hash_size, args.threshold,
+                                            os.path.join(args.output_dir, '.photohash.db'), args.num_workers)
+    photo.process_unique_files(unique_files, args.output_dir, args.copy, args.hash_size)
     
     logging.info(f"Found {len(unique_files)} unique images out of {len(files)} total images")
 
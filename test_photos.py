@@ -1,9 +1,11 @@
 import os
+import re
 import shutil
 import subprocess
 import time
 from pathlib import Path
 from datetime import datetime
+from PIL import Image
 
 class PhotoDedupTester:
     def __init__(self):
@@ -50,9 +52,15 @@ class PhotoDedupTester:
         print(result.stdout)
         if result.stderr:
             print("Errors:", result.stderr)
+        self.last_output = result.stdout
             
         return result.returncode == 0
         
+    def count_output_images(self, output_dir: str) -> int:
+        """Count the image files placed in an output directory."""
+        return sum(1 for file in Path(output_dir).iterdir()
+                   if file.suffix.lower() in {".jpg", ".jpeg", ".png", ".gif", ".bmp"})
+        
     def prepare_test_files(self):
         """Copy example files to test directory."""
         self.cleanup()
@@ -78,13 +86,14 @@ class PhotoDedupTester:
     def test_similarity_threshold(self):
         """Test similarity threshold functionality."""
         self.prepare_test_files()
-        # Create a slightly modified copy of the image
-        for file in self.test_dir.glob("*.JPG"):
-            shutil.copy(file, self.test_dir / "modified_copy.JPG")
+        # Create a re-encoded copy: different bytes, nearly the same perceptual hash
+        for file in self.example_dir.glob("*.JPG"):
+            with Image.open(file) as img:
+                img.save(self.test_dir / "modified_copy.JPG", quality=70)
         return self.run_test(
             "similarity_threshold",
             [str(self.test_dir), "out_threshold", "--threshold", "90"]
-        )
+        ) and self.count_output_images("out_threshold") == 1
         
     def test_hash_size(self):
         """Test different hash sizes."""
@@ -94,6 +103,26 @@ class PhotoDedupTester:
             [str(self.test_dir), "out_hash", "--hash-size", "16"]
         )
         
+    def test_single_worker(self):
+        """Test hashing with a single worker process."""
+        self.prepare_test_files()
+        for file in self.example_dir.glob("*.JPG"):
+            with Image.open(file) as img:
+                img.transpose(Image.Transpose.FLIP_TOP_BOTTOM).save(self.test_dir / f"flipped_{file.name}")
+        expected = len(list(self.test_dir.glob("*.JPG")))
+        return self.run_test(
+            "single_worker",
+            [str(self.test_dir), "out_workers", "--copy", "--num-workers", "1"]
+        ) and self.count_output_images("out_workers") == expected
+        
+    def test_invalid_num_workers(self):
+        """Test that a worker count below one is rejected."""
+        self.prepare_test_files()
+        return not self.run_test(
+            "invalid_num_workers",
+            [str(self.test_dir), "out_workers", "--num-workers", "0"]
+        ) and "Number of workers must be at least 1" in self.last_output
+        
     def test_debug_mode(self):
         """Test debug mode output."""
         self.prepare_test_files()
@@ -119,15 +148,45 @@ class PhotoDedupTester:
         
     def test_filename_conflicts(self):
         """Test handling of filename conflicts."""
-        self.prepare_test_files()
-        # Create multiple copies of the same file
-        for i in range(3):
-            for file in self.test_dir.glob("*.JPG"):
-                shutil.copy(file, self.test_dir / f"copy_{i}.JPG")
+        self.cleanup()
+        # Create distinct images sharing one file name in separate directories
+        transforms = [None, Image.Transpose.FLIP_TOP_BOTTOM, Image.Transpose.ROTATE_90]
+        for i, transform in enumerate(transforms):
+            subdir = self.test_dir / f"camera_{i}"
+            subdir.mkdir()
+            for file in self.example_dir.glob("*.JPG"):
+                with Image.open(file) as img:
+                    (img.transpose(transform) if transform is not None else img).save(subdir / "IMG_0001.JPG")
         return self.run_test(
             "filename_conflicts",
             [str(self.test_dir), "out_conflicts"]
-        )
+        ) and self.count_output_images("out_conflicts") == len(transforms)
+        
+    def test_exact_duplicates(self):
+        """Test that hardlinked and byte-identical files are skipped before hashing."""
+        self.prepare_test_files()
+        for file in self.example_dir.glob("*.JPG"):
+            os.link(self.test_dir / file.name, self.test_dir / "hardlink.JPG")
+            shutil.copy(file, self.test_dir / "byte_copy.JPG")
+            with Image.open(file) as img:
+                img.transpose(Image.Transpose.FLIP_TOP_BOTTOM).save(self.test_dir / "flipped.JPG")
+        return self.run_test(
+            "exact_duplicates",
+            [str(self.test_dir), "out_exact", "--copy"]
+        ) and self.count_output_images("out_exact") == 2 and "Skipping 2 exact duplicate files" in self.last_output
+        
+    def test_hash_cache(self):
+        """Test that a second run into the same output directory reuses cached hashes."""
+        self.prepare_test_files()
+        args = [str(self.test_dir), "out_cache", "--copy"]
+        if not self.run_test("hash_cache_first", args):
+            return False
+        placed = self.count_output_images("out_cache")
+        if not self.run_test("hash_cache_second", args):
+            return False
+        reused = re.search(r"Reusing (\d+) cached hashes", self.last_output)
+        return placed > 0 and reused is not None and int(reused.group(1)) > 0 \
+            and self.count_output_images("out_cache") == 2 * placed
         
     def run_all_tests(self):
         """Run all test cases."""
@@ -136,10 +195,14 @@ class PhotoDedupTester:
             ("Copy Functionality", self.test_copy_functionality),
             ("Similarity Threshold", self.test_similarity_threshold),
             ("Hash Size", self.test_hash_size),
+            ("Single Worker", self.test_single_worker),
+            ("Invalid Num Workers", self.test_invalid_num_workers),
             ("Debug Mode", self.test_debug_mode),
             ("Empty Directory", self.test_empty_directory),
             ("Invalid Directory", self.test_invalid_directory),
             ("Filename Conflicts", self.test_filename_conflicts),
+            ("Exact Duplicates", self.test_exact_duplicates),
+            ("Hash Cache", self.test_hash_cache),
         ]
         
         results = []